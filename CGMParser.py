@@ -2,20 +2,128 @@
 # coding: utf-8
 
 import re
-from dataclasses import dataclass, field
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field, fields
 import logging
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain, islice
 import csv
 from abc import ABC, abstractmethod
+from typing import ClassVar, Iterable, Iterator
 # from gooey import Gooey
-import numpy as np
-import pandas as pd
+# numpy and pandas are only needed for the array/dataframe representations and are imported there, which keeps
+# them out of the import time of plain CSV exports and of the worker processes
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# patterns used in the per-line parsing loops are compiled once at import time.
+# patterns anchored at the line start are used with match() and carry no '^'
 
-@dataclass()
+# first two lines of a GOF record (patient info and insurance info), joined by a line break
+_GOF_HEADER = re.compile(
+    r'(\d*)\s+([\w .-]+), ([\w .-]+)\s+(\d{2}\.\d{2}\.\d{4}).*\n'
+    r'.*?([\w]+)\s+(\d)(\d{4})\s+([MFR]*)\s+(\d*)\s+(\d{2})'
+)
+_GOF_INFO = re.compile(r'(\d{2}\.\d{2}\.\d{4})\s(\w+)(\s\(\w{3}\))*')
+
+_TGS_PATIENT = re.compile(r'Patientennr\. (\d+)\s*(.*)')
+_TGS_INSURANCE = re.compile(r'([\w .-]+),([\w .-]+);\s\*\s(\d{2}\.\d{2}\.\d{4}),\s([\w ()&+/.-]+),\s*([A-Z0-9]*)')
+
+
+def _iso_date(date_str: str) -> str:
+    """convert a date of the format dd.mm.yyyy to yyyy-mm-dd"""
+    return date_str[6:10] + '-' + date_str[3:5] + '-' + date_str[0:2]
+
+
+# notice dates repeat heavily within a quarter, so their conversions are cached. birth dates hardly ever
+# repeat and use _iso_date directly, where a cache miss would only add overhead
+_iso_notice_date = lru_cache(maxsize=1024)(_iso_date)
+
+
+@lru_cache(maxsize=1024)
+def _iso_date_short_year(date_str: str) -> str:
+    """
+    convert a date of the format dd.mm.yy to yyyy-mm-dd
+
+    two digit years are expanded like strptime does: 69-99 become 1969-1999, 00-68 become 2000-2068
+    """
+    century = '19' if date_str[6:8] >= '69' else '20'
+    return century + date_str[6:8] + '-' + date_str[3:5] + '-' + date_str[0:2]
+
+
+def _drop_last(iterable: Iterable, n: int) -> Iterator:
+    """yield all but the last n items of iterable, without materializing it"""
+    it = iter(iterable)
+    buffer = deque(islice(it, n))
+    for item in it:
+        buffer.append(item)
+        yield buffer.popleft()
+
+
+@contextmanager
+def _open_replacing(filepath, **kwargs):
+    """
+    open a uniquely named temporary file next to filepath for writing and move it onto filepath once the block
+    succeeds
+
+    if the block raises, the temporary file is removed and an existing file at filepath is left untouched. the
+    replaced file keeps its permissions, a new file gets the default permissions for the current umask
+    """
+    f = tempfile.NamedTemporaryFile(
+        mode='w', dir=os.path.dirname(filepath) or '.', prefix=os.path.basename(filepath) + '.',
+        suffix='.tmp', delete=False, **kwargs
+    )
+    try:
+        with f:
+            yield f
+        # NamedTemporaryFile is created readable by the owner only
+        try:
+            shutil.copymode(filepath, f.name)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(f.name, 0o666 & ~umask)
+        os.replace(f.name, filepath)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(f.name)
+        raise
+
+
+@dataclass(slots=True)
+class GOFNotice:
+    """represent single notice of a GO-Fehler record"""
+
+    date: str
+    type: str
+    erfasser: str = ''
+    text: str = ''
+
+
+@dataclass(slots=True)
+class TGSNote:
+    """
+    represent single note of a Textgruppenstatistik record
+
+    columns which are left empty in the export are carried over from the previous note by the parser
+    """
+
+    date: str = ''
+    erfasser: str = ''
+    schein_typ: str = ''
+    behandler: str = ''
+    fachgebiet: str = ''
+    zeilentyp: str = ''
+    text: str = ''
+
+
+@dataclass(slots=True)
 class CGMPatient(ABC):
     """
     base class which defines a generic single patient-related record
@@ -23,25 +131,31 @@ class CGMPatient(ABC):
     pat_id: str
     first_name: str
     last_name: str
-    birth_date: datetime.date
+    birth_date: str
+
+    CSV_FIELDS: ClassVar[tuple]  # names of the exported columns
 
     # @abstractmethod
     # def get_instance_variables(self):
     #     """return dict of instance variables and corresponding values"""
 
     @abstractmethod
+    def as_row(self) -> tuple:
+        """return tuple of exported values, in the order given by CSV_FIELDS"""
+
     def repr_as_dict(self) -> dict:
         """return dict of instance variables and corresponding values"""
+        return dict(zip(self.CSV_FIELDS, self.as_row()))
 
-    @abstractmethod
     def repr_as_list(self) -> list:
         """return list of the values of instance variables"""
+        return list(self.as_row())
 
     def get_keys(self):
-        return vars(self).keys()
+        return [f.name for f in fields(self)]
 
 
-@dataclass()
+@dataclass(slots=True)
 class CGMPatientGOF(CGMPatient):
     """
     represent single record in GO-Fehler
@@ -70,73 +184,85 @@ class CGMPatientGOF(CGMPatient):
     ins_status: str
     vknr: str
     ktab: str
-    content: list = field(default_factory=[])
-
-    def repr_as_dict(self) -> dict:
-        instance_variables = vars(self)
-        mod_instance_variables = instance_variables.copy()
-        notices = []
-        for notice in mod_instance_variables['content']:
-            current_notice = [
-                notice['date'],
-                notice['type'],
-                notice['erfasser'],
-                notice['text']
-            ]
-            notices.append('\t'.join(i for i in current_notice))
-        mod_instance_variables['content'] = '\n'.join(i for i in notices)
-
-        return mod_instance_variables
-
-    def repr_as_list(self) -> list:
-        d = self.repr_as_dict()
+    content: list[GOFNotice] = field(default_factory=list)
+
+    CSV_FIELDS = (
+        'pat_id',
+        'first_name',
+        'last_name',
+        'birth_date',
+        'billing_type',
+        'quarter',
+        'qyear',
+        'ins_status',
+        'vknr',
+        'ktab',
+        'content'
+    )
 
-        temp_list = []
-        for k, v in d.items():
-            temp_list.append(v)
-        return temp_list
+    def as_row(self) -> tuple:
+        content = '\n'.join(
+            '\t'.join((notice.date, notice.type, notice.erfasser, notice.text))
+            for notice in self.content
+        )
+        return (
+            self.pat_id,
+            self.first_name,
+            self.last_name,
+            self.birth_date,
+            self.billing_type,
+            self.quarter,
+            self.qyear,
+            self.ins_status,
+            self.vknr,
+            self.ktab,
+            content
+        )
 
 
-@dataclass()
+@dataclass(slots=True)
 class CGMPatientTGS(CGMPatient):
     """represent single record in Textgruppenstatistik"""
 
     kasse: str
     member_id: str
-    groups: list = field(default_factory=[])
-    content: list = field(default_factory=[])
-
-    def repr_as_dict(self) -> dict:
-        inst_vars = vars(self)
-        if len(inst_vars['groups']) == 0:
-            inst_vars['groups'] = ''
-        elif len(inst_vars['groups']) == 1:
-            inst_vars['groups'] = inst_vars['groups'][0]
-        elif len(inst_vars['groups']) > 1:
-            inst_vars['groups'] = ', '.join(inst_vars['groups'])
-
-        notes = []
-        for note in inst_vars['content']:
-            current_note = [
-                note['date'],
-                note['erfasser'],
-                note['schein_typ'],
-                note['behandler'],
-                note['fachgebiet'],
-                note['zeilentyp'],
-                note['text']
-            ]
-            notes.append('\t'.join(i for i in current_note))
-        inst_vars['content'] = '\n'.join(i for i in notes)
-        return inst_vars
-
-    def repr_as_list(self) -> list:
-        d = self.repr_as_dict()
+    groups: list = field(default_factory=list)
+    content: list[TGSNote] = field(default_factory=list)
+
+    CSV_FIELDS = (
+        'pat_id',
+        'first_name',
+        'last_name',
+        'birth_date',
+        'kasse',
+        'member_id',
+        'groups',
+        'content'
+    )
 
-        temp_list = []
-        for k, v in d.items():
-            temp_list.append(v)
-        return temp_list
+    def as_row(self) -> tuple:
+        content = '\n'.join(
+            '\t'.join((
+                note.date,
+                note.erfasser,
+                note.schein_typ,
+                note.behandler,
+                note.fachgebiet,
+                note.zeilentyp,
+                note.text
+            ))
+            for note in self.content
+        )
+        return (
+            self.pat_id,
+            self.first_name,
+            self.last_name,
+            self.birth_date,
+            self.kasse,
+            self.member_id,
+            ', '.join(self.groups),
+            content
+        )
 
 
 class FailedGrepMatch(ValueError):
@@ -147,50 +273,53 @@ class ParsingContext(ABC):
     """define methods specific to a particular input format"""
 
     HEADER: str
-    RECORD_DELIMITER: str
+    HEADER_LINES: tuple  # HEADER split into lines, compared against the first lines of the input
+    RECORD_DELIMITER: str  # delimiter line without trailing whitespace
 
-    def __init__(self, raw_input):
-        self.trimmed_input = raw_input[4:]  # remove header and first patient delimiter
+    def __init__(self, raw_input: Iterable[str]):
+        # raw_input may be any iterable of lines (e.g. an open file), it is only consumed once
+        self.trimmed_input = islice(raw_input, 4, None)  # remove header and first patient delimiter
+
+    def __getstate__(self):
+        # worker processes only parse already separated records, the input stays with the parent process
+        state = self.__dict__.copy()
+        del state['trimmed_input']
+        return state
 
     @abstractmethod
-    def parse_records(self, records):
-        """return list of parsed records (list of CGMPatient)"""
+    def parse_records(self, records: Iterable[list[str]]) -> Iterator[CGMPatient]:
+        """yield parsed records (CGMPatient) for an iterable of records"""
 
     @abstractmethod
-    def _parse_content(self, content):
-        """return parsed record content (list of dicts)"""
+    def _parse_content(self, content: list[str]) -> list:
+        """return parsed record content (list of GOFNotice or TGSNote)"""
 
     @abstractmethod
     def get_headers(self) -> list:
         """return list of column headers for export"""
 
-    #     TODO: the headers are needed in multiple parts of the script and are used explicitly so far.
-    #      a programmatic approach would be better
-
-    def separate_records(self):
-        """return list of records (list of list of strings)"""
+    def separate_records(self) -> Iterator[list[str]]:
+        """yield records (list of strings) one at a time"""
 
-        records = []
         current_record = []
+        record_append = current_record.append
+        delimiter = self.RECORD_DELIMITER
+        # the log level is checked once per run instead of once per record
+        log_debug = logger.isEnabledFor(logging.DEBUG)
         for line in self.trimmed_input:
-            if re.match(self.RECORD_DELIMITER, line):
-                logging.debug('patient delimiter encountered')
-                records.append(current_record)
+            # trim trailing whitespace. leading whitespace (indent) is needed for parsing and is removed later
+            trimmed_line = line.rstrip(' \n')
+            if trimmed_line == delimiter:
+                if log_debug:
+                    logging.debug('patient delimiter encountered')
+                yield current_record
                 current_record = []
+                record_append = current_record.append
                 continue
-            # trim trailing whitespace. leading whitespace (indent) is needed for parsing and is removed later
-            trimmed_line = re.sub(r' +$', '', line)
-            current_record.append(trimmed_line)
-        # add last record to list
-        records.append(current_record)
-        return records
-
-    @staticmethod
-    def _write_record_content(content_item, content_list):
-        content_item['text'] = ' '.join(content_item['text'])
-        content_list.append(content_item)
-        logging.debug('appended notice to list of notices')
-        return content_list
+            record_append(trimmed_line)
+        # yield last record
+        if current_record:
+            yield current_record
 
 
 class ParsingContextGOF(ParsingContext):
@@ -201,91 +330,68 @@ class ParsingContextGOF(ParsingContext):
         'Eintrag                                                                                 \n'
         '==========================================================================================\n'
     )
-    RECORD_DELIMITER = r'={85} {6}\n'
+    HEADER_LINES = tuple(HEADER.splitlines(keepends=True))
+    RECORD_DELIMITER = '=' * 85
 
-    def parse_records(self, records):
-        logging.info('parsing entries using GOF format')
-        records_new = []
+    def parse_records(self, records: Iterable[list[str]]) -> Iterator[CGMPatientGOF]:
+        match_gof_header = _GOF_HEADER.match
+        parse_content = self._parse_content
         for rec in records:
-            # parse first line (patient info)
-            match_0 = re.search(
-                # TODO: can names be empty?
-                r'(^\d*)\s+([\w .-]+), ([\w .-]+)\s+(\d{2}.\d{2}.\d{4})',
-                rec[0]
-            )
-            if not match_0:
-                raise FailedGrepMatch('no match of patient information for record:\n{}'.format(rec))
-
-            # parse second line (insurance info)
-            match_1 = re.search(
-                r'([\w]+)\s+(\d)(\d{4})\s+([MFR]*)\s+(\d*)\s+(\d{2})',
-                rec[1]
-            )
-            if not match_1:
-                raise FailedGrepMatch('no match of insurance information!')
+            # parse first line (patient info) and second line (insurance info) in one go
+            # TODO: can names be empty?
+            match_header = match_gof_header(rec[0] + '\n' + rec[1])
+            if not match_header:
+                raise FailedGrepMatch('no match of patient or insurance information for record:\n{}'.format(rec))
 
             # parse content
-            content = self._parse_content(rec[2:])
-
-            records_new.append(
-                CGMPatientGOF(
-                    pat_id=match_0[1],
-                    first_name=match_0[3],
-                    last_name=match_0[2],
-                    birth_date=datetime.strptime(match_0[4], '%d.%m.%Y').date().strftime('%Y-%m-%d'),
-                    billing_type=match_1[1],
-                    quarter=match_1[2],
-                    qyear=match_1[3],
-                    ins_status=match_1[4],
-                    vknr=match_1[5],
-                    ktab=match_1[6],
-                    content=content
-                )
+            content = parse_content(rec[2:])
+
+            yield CGMPatientGOF(
+                pat_id=match_header[1],
+                first_name=match_header[3],
+                last_name=match_header[2],
+                birth_date=_iso_date(match_header[4]),
+                billing_type=match_header[5],
+                quarter=match_header[6],
+                qyear=match_header[7],
+                ins_status=match_header[8],
+                vknr=match_header[9],
+                ktab=match_header[10],
+                content=content
             )
-        return records_new
 
-    def _parse_content(self, content):
+    def _parse_content(self, content: list[str]) -> list[GOFNotice]:
         content_list = []
-        new_line = True
+        # date, type and erfasser of the current notice. its text lines are collected in a list and joined when
+        # the notice is written
+        current_info = None
+        text_lines = []
+        text_append = text_lines.append
+        match_info_line = _GOF_INFO.match
+        content_append = content_list.append
         for line in content:
-            match_info = re.search(r'^(\d{2}.\d{2}.\d{4})\s(\w+)(\s\(\w{3}\))*', line)
+            # text lines are indented, only lines starting with a digit can carry notice information
+            match_info = line[:1].isdigit() and match_info_line(line)
             if match_info:
-                if not new_line:
-                    content_list = self._write_record_content(current_content, content_list)
-
-                current_content = {
-                    'text': [],
-                    'date': datetime.strptime(match_info[1], '%d.%m.%Y').date().strftime('%Y-%m-%d'),
-                    'type': match_info[2]
-                }
-
-                if not match_info[3]:
-                    # sometimes this information is not given
-                    current_content['erfasser'] = ''
-                else:
-                    current_content['erfasser'] = match_info[3][2:-1]
+                if current_info is not None:
+                    content_append(GOFNotice(*current_info, text=' '.join(text_lines)))
+                    text_lines = []
+                    text_append = text_lines.append
+
+                # sometimes the erfasser is not given
+                erfasser = match_info[3][2:-1] if match_info[3] else ''
+                current_info = (_iso_notice_date(match_info[1]), match_info[2], erfasser)
+            elif current_info is None:
+                raise FailedGrepMatch('no notice information before text line:\n{}'.format(line))
             else:
-                trimmed_line = re.sub(r'^\s*|\n', '', line)
-                current_content['text'].append(trimmed_line)
-            new_line = False
+                text_append(line.lstrip())
 
-        content_list = self._write_record_content(current_content, content_list)
+        if current_info is not None:
+            content_append(GOFNotice(*current_info, text=' '.join(text_lines)))
         return content_list
 
     def get_headers(self) -> list:
-        return [
-            'pat_id',
-            'first_name',
-            'last_name',
-            'birth_date',
-            'billing_type',
-            'quarter',
-            'qyear',
-            'ins_status',
-            'vknr',
-            'ktab',
-            'content'
-        ]
+        return list(CGMPatientGOF.CSV_FIELDS)
 
 
 class ParsingContextTGS(ParsingContext):
@@ -296,98 +402,92 @@ class ParsingContextTGS(ParsingContext):
         'Textgruppenstatistik\n'
         '================================================================================================\n'
     )
-    RECORD_DELIMITER = r'-{96}'
-
-    TGS_INDENT_LEVELS = {
-        'erfasser': 9,
-        'schein_typ': 13,
-        'behandler': 15,
-        'fachgebiet': 19,
-        'zeilentyp': 23
-    }
+    HEADER_LINES = tuple(HEADER.splitlines(keepends=True))
+    RECORD_DELIMITER = '-' * 96
+
+    # content lines are fixed width: the date occupies the first 8 characters, followed by these columns
+    # (name, start, end) and the text, which begins at TGS_TEXT_COLUMN
+    TGS_COLUMNS = (
+        ('erfasser', 9, 13),
+        ('schein_typ', 13, 15),
+        ('behandler', 15, 19),
+        ('fachgebiet', 19, 23),
+        ('zeilentyp', 23, 28)
+    )
+    TGS_TEXT_COLUMN = 28
 
-    def __init__(self, raw_input):
+    def __init__(self, raw_input: Iterable[str]):
         # remove footer from input
-        super().__init__(raw_input[:-3])
+        super().__init__(_drop_last(raw_input, 3))
 
-    def parse_records(self, records):
-        logging.info('parsing entries using TGS format')
-        records_new = []
+    def parse_records(self, records: Iterable[list[str]]) -> Iterator[CGMPatientTGS]:
+        match_patient = _TGS_PATIENT.match
+        search_insurance = _TGS_INSURANCE.search
+        parse_content = self._parse_content
         for rec in records:
             # parse first line (patient ID)
-            match_0 = re.search(
-                r'^Patientennr. (\d+)\s*(.*)',
-                rec[0]
-            )
+            match_0 = match_patient(rec[0])
             if not match_0:
                 raise FailedGrepMatch('no match on first line for record:\n{}'.format(rec))
 
             # parse second line (patient and insurance info)
             # TODO: it may be that if a patient dies within the current quarter, then the death date will
             #  show up in this line, since the birth date is designated with a '*'. Try to generate example input
-            match_1 = re.search(r'([\w .-]+),([\w .-]+);\s\*\s(\d{2}.\d{2}.\d{4}),\s([\w ()&+/.-]+),\s*([A-Z0-9]*)',
-                                rec[1])
+            match_1 = search_insurance(rec[1])
             if not match_1:
                 raise FailedGrepMatch('no match on second line for record:\n{}'.format(rec))
 
             # parse notes
-            content = self._parse_content(rec[2:])
-
-            records_new.append(
-                CGMPatientTGS(
-                    pat_id=match_0[1],
-                    first_name=match_1[2],
-                    last_name=match_1[1],
-                    birth_date=datetime.strptime(match_1[3], '%d.%m.%Y').date().strftime('%Y-%m-%d'),
-                    kasse=match_1[4],
-                    member_id=match_1[5],
-                    groups=match_0[2][1:-1].split(sep=', '),
-                    content=content
-                )
+            content = parse_content(rec[2:])
+
+            yield CGMPatientTGS(
+                pat_id=match_0[1],
+                first_name=match_1[2],
+                last_name=match_1[1],
+                birth_date=_iso_date(match_1[3]),
+                kasse=match_1[4],
+                member_id=match_1[5],
+                groups=match_0[2][1:-1].split(sep=', '),
+                content=content
             )
-        return records_new
 
-    def _parse_content(self, content):
+    def _parse_content(self, content: list[str]) -> list[TGSNote]:
         content_list = []
-        current_content = {'text': []}
+        # date and column values are carried over to the following notes until they are overwritten
+        attributes = {}
+        text_lines = []
         new_line = True
+        text_append = text_lines.append
+        content_append = content_list.append
+        columns = self.TGS_COLUMNS
+        text_column = self.TGS_TEXT_COLUMN
         for line in content:
-            for k, v in self.TGS_INDENT_LEVELS.items():
-                # TODO: combine searches with regex OR operator (|)?
-                match_date = re.search(r'^(\d{2}.\d{2}.\d{2})', line)
-                match_other = re.search(r'^.{{{}}}([\w-]+)'.format(v), line)
-                if not new_line and (match_date or match_other):
+            field_area = line[:text_column]
+            # a blank field area means that the line continues the text of the previous line
+            if field_area.strip():
+                if not new_line:
                     # different from GOF, here we want to retain attributes, but we clear text for next loop
-                    # this is done by creating a copy
-                    content_list = self._write_record_content(current_content, content_list)
-                    current_content = current_content.copy()
-                    current_content['text'] = []
-                    new_line = True
-                if match_date:
-                    current_content['date'] = datetime.strptime(match_date[1], '%d.%m.%y').date().strftime(
-                        '%Y-%m-%d')
-                if match_other:
-                    current_content[k] = match_other[1]
+                    content_append(TGSNote(text=' '.join(text_lines), **attributes))
+                    text_lines = []
+                    text_append = text_lines.append
+                if field_area[2:3] == '.':
+                    attributes['date'] = _iso_date_short_year(field_area[:8])
+                for k, start, end in columns:
+                    value = field_area[start:end].strip()
+                    if value:
+                        attributes[k] = value
             new_line = False
 
-            match_text = re.search(r'.{28}(.+)', line)
-            if match_text:
-                current_content['text'].append(match_text[1])
+            text = line[text_column:]
+            if text:
+                text_append(text)
 
-        content_list = self._write_record_content(current_content, content_list)
+        if not new_line:
+            content_append(TGSNote(text=' '.join(text_lines), **attributes))
         return content_list
 
     def get_headers(self) -> list:
-        return [
-            'pat_id',
-            'first_name',
-            'last_name',
-            'birth_date',
-            'kasse',
-            'member_id',
-            'groups',
-            'content'
-        ]
+        return list(CGMPatientTGS.CSV_FIELDS)
 
 
 class CGMParser:
@@ -397,74 +497,102 @@ class CGMParser:
     supported input types:
     GO-Fehler (1. von 3 Protokollen bei der Kassenabrechnung)
     TGS (Textgruppenstatistik)
+
+    records are parsed lazily: parsed_records is an iterator which is consumed by the first export. as a
+    consequence, malformed records raise FailedGrepMatch during that export rather than in __init__. the export
+    methods write to a temporary file first, so a failed export leaves the output file untouched
+
+    with jobs > 1, records are parsed in chunks by that many worker processes. this only pays off for large
+    inputs on multi-core machines, and all chunks are read from the input as soon as parsing starts
     """
 
-    def __init__(self, raw_input):
+    PARALLEL_CHUNK_SIZE = 1024  # records per task handed to a worker process
+    WRITE_BUFFER_SIZE = 1 << 20  # bytes buffered before the export files are written to
+
+    def __init__(self, raw_input, jobs=1):
         self.context = self._determine_context(raw_input)
-        self.records = self.context.separate_records()
-        self.parsed_records = self.context.parse_records(self.records)
+        records = self.context.separate_records()
+        if jobs > 1:
+            self.parsed_records = self._parse_parallel(records, jobs)
+        else:
+            self.parsed_records = self.context.parse_records(records)
+
+    def _parse_parallel(self, records, jobs):
+        """yield parsed records, parsing chunks of records in worker processes"""
+        chunks = iter(lambda: list(islice(records, self.PARALLEL_CHUNK_SIZE)), [])
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for parsed_chunk in executor.map(partial(_parse_record_chunk, self.context), chunks):
+                yield from parsed_chunk
 
     @staticmethod
     def _determine_context(raw_input):
         """assign relevant context to self.context based on raw input"""
-        h = ''.join(raw_input[:3])
+        raw_input = iter(raw_input)
+        header = tuple(islice(raw_input, 3))
+        # hand the header back to the context, which expects the complete input
+        raw_input = chain(header, raw_input)
 
-        if h == ParsingContextGOF.HEADER:
+        if header == ParsingContextGOF.HEADER_LINES:
             logging.info('context set to GOF')
             return ParsingContextGOF(raw_input)
-        elif h == ParsingContextTGS.HEADER:
+        elif header == ParsingContextTGS.HEADER_LINES:
             logging.info('context set to TGS')
             return ParsingContextTGS(raw_input)
 
     def export_csv(self, filepath):
-        with open(filepath, mode='w', encoding='UTF-8') as f:
-            csv_writer = csv.DictWriter(f, delimiter=';', quoting=csv.QUOTE_ALL)
-            csv_writer.writeheader()
-            for rec in self.parsed_records:
-                csv_writer.writerow(rec.repr_as_dict())
+        # newline='' is required by the csv module, it writes its own line terminators
+        with _open_replacing(filepath, encoding='UTF-8', newline='', buffering=self.WRITE_BUFFER_SIZE) as f:
+            csv_writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+            csv_writer.writerow(self.context.get_headers())
+            csv_writer.writerows(rec.as_row() for rec in self.parsed_records)
 
     def repr_as_np_array(self):
+        import numpy as np
+
         a = []
         for rec in self.parsed_records:
             a.append(rec.repr_as_list())
         return np.array(a)
 
     def repr_as_pd_dataframe(self):
-        a = self.repr_as_np_array()
-        return pd.DataFrame(data=a, columns=self.context.get_headers())
+        import pandas as pd
+
+        return pd.DataFrame.from_records(
+            (rec.as_row() for rec in self.parsed_records),
+            columns=self.context.get_headers()
+        )
 
     def export_ids(self, filepath):
-        with open(filepath, mode='w') as f:
-            for rec in self.parsed_records:
-                f.writelines(rec.pat_id + '\n')
+        with _open_replacing(filepath, encoding='UTF-8', buffering=self.WRITE_BUFFER_SIZE) as f:
+            f.writelines(rec.pat_id + '\n' for rec in self.parsed_records)
 
 
-def difference_of_sets(df1, df2):
-    intersection = pd.merge(df1, df2, how='inner', on=0)
-    df3 = df1.set_index(0).drop(intersection[0])
-    df3.reset_index(level=0, inplace=True)
-    return df3
+def _parse_record_chunk(context, records):
+    """return list of parsed records, run in a worker process by CGMParser._parse_parallel"""
+    return list(context.parse_records(records))
 
 
-def main(args):
-    with open(args.input_path, 'r', encoding='cp1252') as f:
-        data1 = f.readlines()
+def difference_of_sets(df1, df2):
+    """return the records of df1 whose patient ID does not occur in df2"""
+    return df1[~df1['pat_id'].isin(df2['pat_id'])].reset_index(drop=True)
 
-    p1 = CGMParser(data1)
 
-    if args.difference:
+def main(args):
+    # the input files are streamed line by line, so they have to stay open until the records are exported
+    with open(args.input_path, 'r', encoding='cp1252') as f1:
+        p1 = CGMParser(f1, jobs=args.jobs)
 
-        with open(args.difference, 'r', encoding='cp1252') as f:
-            data2 = f.readlines()
+        if args.difference:
 
-        p2 = CGMParser(data2)
-        difference = difference_of_sets(
-            p1.repr_as_pd_dataframe(),
-            p2.repr_as_pd_dataframe()
-        )
-        difference.to_csv(args.output_path, sep=';')
-    else:
-        p1.export_csv(args.output_path)
+            with open(args.difference, 'r', encoding='cp1252') as f2:
+                p2 = CGMParser(f2, jobs=args.jobs)
+                difference = difference_of_sets(
+                    p1.repr_as_pd_dataframe(),
+                    p2.repr_as_pd_dataframe()
+                )
+            difference.to_csv(args.output_path, sep=';')
+        else:
+            p1.export_csv(args.output_path)
 
 
 if __name__ == "__main__":
@@ -492,6 +620,13 @@ if __name__ == "__main__":
             default='out.csv',
             help='relative path to the output (CSV) file'
         )
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            type=int,
+            default=1,
+            help='number of worker processes used for parsing. only worthwhile for very large input files'
+        )
         return parser.parse_args()
 
 